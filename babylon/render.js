@@ -1,3 +1,16 @@
+function decodeBase64(str, arrayType) {
+    const binary = atob(str);
+    const bytes = new Uint8Array(binary.length);
+    for (let i = 0; i < binary.length; i++) {
+        bytes[i] = binary.charCodeAt(i);
+    };
+    return new arrayType(bytes.buffer);
+};
+
+function decodeFrames(data, arrayType, isAnimated) {
+    return isAnimated ? data.map(str => decodeBase64(str, arrayType)) : decodeBase64(data, arrayType);
+};
+
 function renderMultiScene(objects, alpha, beta, numFrames, frameLength) {
     const engineCanvas = document.getElementById("engineCanvas");
     const engine = new BABYLON.Engine(engineCanvas);
@@ -30,6 +43,10 @@ function renderMultiScene(objects, alpha, beta, numFrames, frameLength) {
         };
 
         if (object.type == "mesh") {
+            object.positions = decodeFrames(object.positionsB64, Float32Array, object.isAnimated);
+            object.indices = decodeFrames(object.indicesB64, Uint32Array, object.isAnimated);
+            object.normals = decodeFrames(object.normalsB64, Float32Array, object.isAnimated);
+
             const mesh = new BABYLON.Mesh("mesh" + i, scene);
             const material = new BABYLON.StandardMaterial("meshMat" + i, scene);
             const vertexData = new BABYLON.VertexData();
@@ -1,7 +1,111 @@
+from base64 import b64encode
+from concurrent.futures import ThreadPoolExecutor
 from importlib.resources import read_text
+from io import StringIO
+from json import dumps
 from matplotlib.cm import turbo
-from numpy import arange, array, concatenate, diff, expand_dims, ndarray, pi, stack
-from typing import Optional
+from numpy import arange, asarray, ascontiguousarray, clip, concatenate, diff, empty, expand_dims, float32, isnan, ndarray, pi, savetxt, stack, take, where
+from typing import List, Optional, Tuple, Union
+
+try:
+    import orjson
+except ImportError:
+    orjson = None
+
+# Renderer source and the fixed parts of the page are the same for every scene, so they are built once at import
+_RENDER_JS = read_text('babylon', 'render.js')
+
+_HTML_HEAD = """
+        <!DOCTYPE html>
+        <html>
+        <head>
+            <style>
+                canvas#engineCanvas { width: 0; height: 0 }
+                div.row { display: flex }"""
+
+_HTML_TAIL = """
+            </script>
+        </body>
+        """
+
+# RGBA colors of the Turbo colormap, one per entry of its lookup table
+_TURBO_LUT = turbo(arange(turbo.N))
+
+
+def _arr_to_jsfloat_list(arr: ndarray) -> str:
+    """Serializes a float array to a nested JavaScript array literal with 7 significant digits, formatting rows with savetxt instead of building Python lists"""
+    if arr.size == 0:
+        return dumps(arr.tolist())
+
+    # Every row has the same length, so the row format is built once rather than per frame
+    row_fmt = ','.join(['%.7g'] * arr.shape[-1])
+
+    def rows_to_js(sub_arr: ndarray) -> str:
+        if sub_arr.ndim > 2:
+            return f"""[{', '.join(rows_to_js(frame_arr) for frame_arr in sub_arr)}]"""
+
+        buf = StringIO()
+        savetxt(buf, sub_arr.reshape(-1, sub_arr.shape[-1]), fmt=row_fmt, newline='],[')
+        rows_str = buf.getvalue()[:-len('],[')]
+        return f'[{rows_str}]' if sub_arr.ndim == 1 else f'[[{rows_str}]]'
+
+    return rows_to_js(arr)
+
+
+def _to_js_array(data: Union[ndarray, List[ndarray]]) -> str:
+    """Serializes an array, or a list of arrays, to a JavaScript array literal, using orjson if available"""
+    if isinstance(data, ndarray):
+        data = ascontiguousarray(data)
+
+    if orjson is not None:
+        return orjson.dumps(data, option=orjson.OPT_SERIALIZE_NUMPY).decode()
+
+    if isinstance(data, list):
+        return f"""[{', '.join(_to_js_array(arr) for arr in data)}]"""
+
+    if data.dtype.kind == 'f':
+        return _arr_to_jsfloat_list(data)
+
+    return dumps(data.tolist())
+
+
+def _append_gathered(xs: ndarray, idxs: ndarray) -> ndarray:
+    """Returns rows of xs followed by rows of xs at idxs, gathered directly into one preallocated array"""
+    out = empty((len(xs) + len(idxs), *xs.shape[1:]), dtype=xs.dtype)
+    out[:len(xs)] = xs
+
+    # Indices are known to be in range, and clipping lets take write into out without an intermediate buffer
+    take(xs, idxs, axis=0, out=out[len(xs):], mode='clip')
+    return out
+
+
+def _to_js_b64(data: Union[ndarray, List[ndarray]], dtype: str) -> str:
+    """Encodes a flat array, or a list of flat per-frame arrays, as base64 strings of raw bytes of the specified dtype, to be decoded into typed arrays in JavaScript"""
+    if isinstance(data, list) or data.ndim > 1:
+        return f"""[{', '.join(_to_js_b64(frame_data, dtype) for frame_data in data)}]"""
+
+    return f'"{b64encode(data.astype(dtype, copy=False).tobytes()).decode()}"'
+
+
+def _swizzle_zup(xs: ndarray) -> ndarray:
+    """Converts positions from z-up (x forward, y right) to Babylon's y-up (x right, y up, z forward) convention"""
+    return stack((xs[..., 1], xs[..., 2], xs[..., 0]), axis=-1)
+
+
+def _turbo_fast(cs: ndarray) -> ndarray:
+    """Maps values in range 0 to 1 to RGBA colors from the Turbo colormap without the matplotlib call overhead
+
+    Note:
+        Float input gives the same colors as turbo(cs), including its bad color for NaN, but integer input is treated as values in range 0 to 1 rather than as lookup table indices
+    """
+    cs = asarray(cs, dtype=float)
+    is_bad = isnan(cs)
+
+    # Clipping before the cast keeps NaN and infinite values out of the integer conversion
+    idxs = clip(where(is_bad, 0, cs) * turbo.N, 0, turbo.N - 1).astype(int)
+    colors = take(_TURBO_LUT, idxs, axis=0)
+    colors[is_bad] = turbo.get_bad()
+    return colors
 
 
 class MultiScene:
@@ -20,38 +124,7 @@ class MultiScene:
         self.beta = beta
         self.num_frames = num_frames
         self.frame_length = frame_length
-
-        row_str = """<canvas class="sceneCanvas"></canvas>""" * num_cols
-        row_str = f"""<div class="row">{row_str}</div>"""
-        body_str = row_str * num_rows
-        body_str = f"""<canvas id="engineCanvas"></canvas>{body_str}"""
-
-        js_str = read_text('babylon', 'render.js')
-
-        self.pre_html_str = f"""
-        <!DOCTYPE html>
-        <html>
-        <head>
-            <style>
-                canvas#engineCanvas {{ width: 0; height: 0 }}
-                div.row {{ display: flex }}
-                canvas.sceneCanvas {{ width: {100 // num_cols}vw; height: {100 // num_rows}vh }}
-            </style>
-            <script src="https://cdn.babylonjs.com/babylon.js"></script>
-            <script src="https://cdn.babylonjs.com/gui/babylon.gui.js"></script>
-        </head>
-        <body>
-            {body_str}
-            <script>
-                {js_str}
-        """
-
-        self.obj_strs = []
-
-        self.post_html_str = f"""
-            </script>
-        </body>
-        """
+        self.obj_fragments = []
 
     def add_mesh(self, row: int, col: int, fs: ndarray, faces: ndarray, Ns: ndarray, uvs: Optional[ndarray] = None, wrap_us: bool = False, cs: Optional[ndarray] = None, y_up: bool = False, is_animated: bool = False):
         """Adds a mesh to a specified scene, with no colors, colors from a checkerboard pattern, or colors from the Turbo colormap
@@ -73,7 +146,13 @@ class MultiScene:
         """
         scene_id = row * self.num_cols + col
         if not y_up:
-            fs = fs[..., array([1, 2, 0])]
+            fs = _swizzle_zup(fs)
+
+        # Babylon.js stores vertex data as 32-bit floats, so extra precision only bloats the HTML
+        fs = fs.astype(float32, copy=False)
+        Ns = Ns.astype(float32, copy=False)
+        if uvs is not None:
+            uvs = uvs.astype(float32, copy=False)
 
         if not is_animated:
             fs = expand_dims(fs, 0)
@@ -85,50 +164,52 @@ class MultiScene:
             if cs is not None:
                 cs = expand_dims(cs, 0)
 
-        all_positions = []
-        all_indices = []
-        all_normals = []
+        num_frames = len(fs)
 
-        if uvs is not None:
-            all_uvs = []
-
-        if cs is not None:
-            all_colors = []
+        if uvs is not None and wrap_us:
+            # Vertices duplicated across the seam are numbered after the original ones
+            first_crossing_idx = faces.max() + 1
 
-        for frame in range(len(fs)):
-            if uvs is not None and wrap_us:
+            def wrap_frame(frame: int) -> Tuple[ndarray, ndarray, ndarray, ndarray]:
                 us_by_face = uvs[frame, :, 0][faces]
                 crosses_seam = (abs(diff(us_by_face, axis=-1)) > 0.75).any(axis=-1)
                 crossing_faces = faces[crosses_seam]
-                crossing_fs = fs[frame, crossing_faces].reshape(-1, 3)
-                crossing_Ns = Ns[frame, crossing_faces].reshape(-1, 3)
+                crossing_idxs = crossing_faces.ravel()
 
-                crossing_us_by_face = us_by_face[crosses_seam]
-                crossing_us_by_face += (crossing_us_by_face < 0.5)
-                crossing_us = crossing_us_by_face.flatten()
-                crossing_vs = uvs[frame, :, 1][crossing_faces].flatten()
-                crossing_uvs = stack([crossing_us, crossing_vs], axis=-1)
+                positions = _append_gathered(fs[frame], crossing_idxs).ravel()
+                normals = _append_gathered(Ns[frame], crossing_idxs).ravel()
 
-                all_positions.append(concatenate([fs[frame], crossing_fs]).flatten().tolist())
-                all_normals.append(concatenate([Ns[frame], crossing_Ns]).flatten().tolist())
-                wrapped_uvs = concatenate([uvs[frame], crossing_uvs])
-                wrapped_uvs /= array([[2, 1]])
-                wrapped_uvs = wrapped_uvs.flatten().tolist()
-                all_uvs.append(wrapped_uvs)
+                wrapped_uvs = _append_gathered(uvs[frame], crossing_idxs)
+                crossing_us = wrapped_uvs[uvs.shape[1]:, 0]
+                crossing_us += (crossing_us < 0.5)
 
-                crossing_faces = faces.max() + 1 + arange(len(crossing_fs)).reshape(-1, 3)
-                all_indices.append(concatenate([faces[~crosses_seam], crossing_faces]).flatten().tolist())
+                # Shifted U coordinates run up to 2, so only the U column is rescaled for the wrapping texture
+                wrapped_uvs[:, 0] *= 0.5
 
+                crossing_faces = first_crossing_idx + arange(crossing_faces.size).reshape(-1, 3)
+                indices = concatenate([faces[~crosses_seam], crossing_faces]).ravel()
+                return positions, indices, normals, wrapped_uvs.ravel()
+
+            # Frames are independent and NumPy releases the GIL while gathering and copying, so animated frames are wrapped in parallel
+            if is_animated:
+                with ThreadPoolExecutor() as executor:
+                    wrapped_frames = list(executor.map(wrap_frame, range(num_frames)))
             else:
-                all_positions.append(fs[frame].flatten().tolist())
-                all_indices.append(faces.flatten().tolist())
-                all_normals.append(Ns[frame].flatten().tolist())
+                wrapped_frames = [wrap_frame(0)]
+
+            all_positions, all_indices, all_normals, all_uvs = (list(frame_data) for frame_data in zip(*wrapped_frames))
+
+        else:
+            # Without seam wrapping every frame is a plain reshape, so all frames are converted at once
+            all_positions = fs.reshape(num_frames, -1)
+            all_indices = [faces.ravel()] * num_frames
+            all_normals = Ns.reshape(num_frames, -1)
 
-                if uvs is not None:
-                    all_uvs.append(uvs[frame].flatten().tolist())
+            if uvs is not None:
+                all_uvs = uvs.reshape(num_frames, -1)
 
-                elif cs is not None:
-                    all_colors.append(turbo(cs[frame]).flatten().tolist())
+            elif cs is not None:
+                all_colors = _turbo_fast(cs).reshape(num_frames, -1)
 
         if not is_animated:
             all_positions = all_positions[0]
@@ -144,17 +225,21 @@ class MultiScene:
         has_uvs = 'true' if uvs is not None else 'false'
         has_colors = 'true' if uvs is None and cs is not None else 'false'
         is_animated = 'true' if is_animated else 'false'
-        obj_str = f"""{{ type: "mesh", sceneId: {scene_id}, positions: {all_positions}, indices: {all_indices}, normals: {all_normals}, hasUvs: {has_uvs}, hasColors: {has_colors}, isAnimated: {is_animated}"""
+        fragments = [
+            f"""{{ type: "mesh", sceneId: {scene_id}, positionsB64: """, _to_js_b64(all_positions, '<f4'),
+            """, indicesB64: """, _to_js_b64(all_indices, '<u4'),
+            """, normalsB64: """, _to_js_b64(all_normals, '<f4'),
+            f""", hasUvs: {has_uvs}, hasColors: {has_colors}, isAnimated: {is_animated}"""
+        ]
         
         if uvs is not None:
             wrap_us = 'true' if wrap_us else 'false'
-            obj_str = f"""{obj_str}, uvs: {all_uvs}, wrapUs: {wrap_us}}}"""
+            fragments += [""", uvs: """, _to_js_array(all_uvs), f""", wrapUs: {wrap_us}"""]
         elif cs is not None:
-            obj_str = f"""{obj_str}, colors: {all_colors}}}"""
-        else:
-            obj_str = f"""{obj_str}}}"""
+            fragments += [""", colors: """, _to_js_array(all_colors)]
 
-        self.obj_strs.append(obj_str)
+        fragments.append("""}""")
+        self.obj_fragments.append(fragments)
 
     def add_point_cloud(self, row: int, col: int, xs: ndarray, radii: float = 0.1, cs: Optional[ndarray] = None, y_up: bool = False, is_animated: bool = False):
         """Adds a point cloud to a specified scene, with no colors or colors from the Turbo colormap
@@ -170,20 +255,23 @@ class MultiScene:
         """
         scene_id = row * self.num_cols + col
         if not y_up:
-            xs = xs[..., array([1, 2, 0])]
+            xs = _swizzle_zup(xs)
 
-        positions = xs.tolist()
+        xs = xs.astype(float32, copy=False)
+        positions = _to_js_array(xs)
         has_colors = 'true' if cs is not None else 'false'
         is_animated = 'true' if is_animated else 'false'
-        obj_str = f"""{{ type: "pointCloud", sceneId: {scene_id}, numPoints: {xs.shape[-2]}, positions: {positions}, radii: {radii}, hasColors: {has_colors}, isAnimated: {is_animated}"""
+        fragments = [
+            f"""{{ type: "pointCloud", sceneId: {scene_id}, numPoints: {xs.shape[-2]}, positions: """, positions,
+            f""", radii: {radii}, hasColors: {has_colors}, isAnimated: {is_animated}"""
+        ]
 
         if cs is not None:
-            colors = turbo(cs)[..., :3].tolist()
-            obj_str = f"""{obj_str}, colors: {colors}}}"""
-        else:
-            obj_str = f"""{obj_str}}}"""
+            colors = _to_js_array(_turbo_fast(cs)[..., :3].astype(float32))
+            fragments += [""", colors: """, colors]
 
-        self.obj_strs.append(obj_str)
+        fragments.append("""}""")
+        self.obj_fragments.append(fragments)
 
     def add_curve(self, row: int, col: int, xs: ndarray, is_looped: bool = False, radius: float = 0.1, color: Optional[ndarray] = None, y_up: bool = False, is_animated: bool = False):
         """Adds a curve to a specified scene, with no colors or colors from the Turbo colormap
@@ -200,33 +288,58 @@ class MultiScene:
         """
         scene_id = row * self.num_cols + col
         if not y_up:
-            xs = xs[..., array([1, 2, 0])]
+            xs = _swizzle_zup(xs)
 
+        xs = xs.astype(float32, copy=False)
         if is_looped:
             xs = concatenate([xs, xs[..., 0:2, :]], axis=-2)
 
-        positions = xs.tolist()
+        positions = _to_js_array(xs)
         has_colors = 'true' if color is not None else 'false'
         is_animated = 'true' if is_animated else 'false'
-        obj_str = f"""{{ type: "curve", sceneId: {scene_id}, positions: {positions}, radius: {radius}, hasColors: {has_colors}, isAnimated: {is_animated}"""
+        fragments = [
+            f"""{{ type: "curve", sceneId: {scene_id}, positions: """, positions,
+            f""", radius: {radius}, hasColors: {has_colors}, isAnimated: {is_animated}"""
+        ]
         
         if color is not None:
-            if is_animated == 'true':
-                color = turbo(color)[:, :3].tolist()
-            else:
-                color = array(turbo(color)[:3]).tolist()
-
-            obj_str = f"""{obj_str}, colors: {color}}}"""
-        else:
-            obj_str = f"""{obj_str}}}"""
+            # One color per frame gives shape num_frames * 3, and a single color gives shape 3
+            colors = _to_js_array(_turbo_fast(color)[..., :3].astype(float32))
+            fragments += [""", colors: """, colors]
 
-        self.obj_strs.append(obj_str)
+        fragments.append("""}""")
+        self.obj_fragments.append(fragments)
 
     def make(self) -> str:
         """Generate HTML string for rendering"""
-        js_str = ", ".join(self.obj_strs)
-        js_str = f'renderMultiScene([{js_str}], {self.alpha}, {self.beta}, {self.num_frames}, {self.frame_length})'
-        return self.pre_html_str + js_str + self.post_html_str
+        row_str = """<canvas class="sceneCanvas"></canvas>""" * self.num_cols
+        row_str = f"""<div class="row">{row_str}</div>"""
+        body_str = row_str * self.num_rows
+        body_str = f"""<canvas id="engineCanvas"></canvas>{body_str}"""
+
+        out = StringIO()
+        out.write(_HTML_HEAD)
+        out.write(f"""
+                canvas.sceneCanvas {{ width: {100 // self.num_cols}vw; height: {100 // self.num_rows}vh }}
+            </style>
+            <script src="https://cdn.babylonjs.com/babylon.js"></script>
+            <script src="https://cdn.babylonjs.com/gui/babylon.gui.js"></script>
+        </head>
+        <body>
+            {body_str}
+            <script>
+                """)
+        out.write(_RENDER_JS)
+        out.write('\n        renderMultiScene([')
+        for i, fragments in enumerate(self.obj_fragments):
+            if i > 0:
+                out.write(', ')
+
+            out.writelines(fragments)
+
+        out.write(f'], {self.alpha}, {self.beta}, {self.num_frames}, {self.frame_length})')
+        out.write(_HTML_TAIL)
+        return out.getvalue()
 
 
 class Scene:
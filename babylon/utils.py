@@ -1,6 +1,6 @@
-from http.server import SimpleHTTPRequestHandler
+from gzip import compress
+from http.server import SimpleHTTPRequestHandler, ThreadingHTTPServer
 from socket import AF_INET, SOCK_DGRAM, socket
-from socketserver import TCPServer
 
 
 def serve_html(html_str: str, serve_locally: bool = True, port: int = 8000):
@@ -12,12 +12,23 @@ def serve_html(html_str: str, serve_locally: bool = True, port: int = 8000):
         port (int): server port
     """
 
+    # Encode and compress once, rather than on every request
+    payload = html_str.encode()
+    gzipped_payload = compress(payload, compresslevel=1)
+
     class Handler(SimpleHTTPRequestHandler):
         def do_GET(self):
+            accepts_gzip = 'gzip' in self.headers.get('Accept-Encoding', '')
+            body = gzipped_payload if accepts_gzip else payload
+
             self.send_response(200)
             self.send_header('Content-type', 'text/html')
+            if accepts_gzip:
+                self.send_header('Content-Encoding', 'gzip')
+
+            self.send_header('Content-Length', str(len(body)))
             self.end_headers()
-            self.wfile.write(html_str.encode())
+            self.wfile.write(body)
 
     if serve_locally:
         ip = 'localhost'
@@ -26,12 +37,8 @@ def serve_html(html_str: str, serve_locally: bool = True, port: int = 8000):
             s.connect(('8.8.8.8', 80))
             ip = s.getsockname()[0]
 
-    with TCPServer((ip, port), Handler, bind_and_activate=False) as httpd:
-        # Allow quicker startups after shutdowns
-        httpd.allow_reuse_address = True
-        httpd.server_bind()
-        httpd.server_activate()
-
+    # HTTPServer allows address reuse for quicker startups after shutdowns, and threads serve parallel requests concurrently
+    with ThreadingHTTPServer((ip, port), Handler) as httpd:
         print(f'Serving at http://{ip}:{port}')
         httpd.serve_forever()
 
@@ -5,9 +5,12 @@ setup(
     name='babylon',
     packages=find_packages(),
     install_requires=[
-        'numpy',
-        'matplotlib'
+        'numpy>=1.20',
+        'matplotlib>=3.3'
     ],
+    extras_require={
+        'fast': ['orjson']
+    },
     include_package_data=True,
     package_data={
         "babylon": ["render.js"]